@@ -0,0 +1,380 @@
+"""
+Shrinks a bigram model for deployment on memory constrained machines, by
+pruning N-Grams (either by count or by relative entropy, as described by
+Stolcke), quantizing the log probabilities and backoff weights to 8 or 16
+bits and storing them in sorted arrays rather than dictionaries.
+
+The pruned counts are plain Frequency objects that can be passed to the
+generators and discounters, while a CompactBigramModel can be used as the
+ptable of a BigramSentenceGenerator or GoodTuringDiscounter.
+"""
+
+from __future__ import division
+import sys
+import math
+from array import array
+from bisect import bisect_left
+from counting import Frequency
+from smoothing import GoodTuringDiscounter
+
+def count_prune(frequency, threshold=2):
+    """
+    Returns a new frequency with only the N-Grams seen at least threshold
+    times in the original frequency.
+    """
+    pruned = Frequency()
+    for ngram, count in frequency.items():
+        if count >= threshold:
+            pruned[ngram] = count
+    return pruned
+
+class KatzEstimator(object):
+    """
+    Estimates backoff bigram probabilities by applying the Good-Turing
+    discount to bigrams seen at most K times and backing off to the
+    unigram probability with the mass that is left over.
+    """
+
+    def __init__(self, unigrams, bigrams, K=5):
+        self.unigrams = unigrams
+        self.bigrams  = bigrams
+        self.K = K
+        self.total = unigrams.total()
+        self.discounter = GoodTuringDiscounter(unigrams, bigrams)
+        self._discounts = {}
+        self.history = {}
+        for (prev, word), count in bigrams.items():
+            self.history.setdefault(prev, []).append((word, count))
+
+    def discount(self, c):
+        """
+        Returns the Good-Turing discounted count for c, leaving large (and
+        so reliable) counts and degenerate estimates undiscounted.
+        """
+        if c not in self._discounts:
+            star = c
+            if c <= self.K and self.discounter.countN(c+1):
+                star = self.discounter.countstar(c)
+                if not 0 < star < c:
+                    star = c
+            self._discounts[c] = star
+        return self._discounts[c]
+
+    def unigram(self, word):
+        return self.unigrams.get(word, 0) / self.total
+
+    def conditional(self, prev):
+        """
+        Returns the discounted probabilities of the words seen after prev,
+        the probability mass left over for unseen words (beta) and the
+        unigram probability of the seen words.
+        """
+        probs = {}
+        for word, count in self.history.get(prev, []):
+            probs[word] = self.discount(count) / self.unigrams[prev]
+        beta = max(1.0 - sum(probs.values()), 0.0)
+        seen = sum(self.unigram(word) for word in probs)
+        return probs, beta, seen
+
+def backoff(beta, seen):
+    """
+    Computes the backoff weight that spreads beta over the unigram mass
+    of the words not seen after a history.
+    """
+    if beta <= 0 or seen >= 1:
+        return 0.0
+    return beta / (1.0 - seen)
+
+def entropy_prune(unigrams, bigrams, threshold=1e-7, K=5, estimator=None):
+    """
+    Stolcke-style pruning, removes every bigram whose removal from the
+    backoff model increases the relative entropy of the model by less
+    than the threshold. As in Stolcke's paper, every bigram is judged
+    against the original model, rather than after each removal. An
+    existing estimator of the counts can be passed in to be reused.
+    """
+    model  = estimator or KatzEstimator(unigrams, bigrams, K)
+    pruned = Frequency()
+
+    for prev in model.history:
+        probs, beta, seen = model.conditional(prev)
+        alpha = backoff(beta, seen)
+        ph = model.unigram(prev)
+
+        for word, count in model.history[prev]:
+            pw  = probs[word]
+            uni = model.unigram(word)
+            pruned_alpha = backoff(beta + pw, seen - uni)
+
+            # Change in entropy of the explicit estimate for this bigram.
+            if pruned_alpha * uni > 0:
+                delta = pw * (math.log(pruned_alpha * uni) - math.log(pw))
+            else:
+                delta = float('-inf')
+
+            # Change in entropy of the estimates backed off to unigrams.
+            if alpha > 0:
+                delta += beta * (math.log(pruned_alpha) - math.log(alpha))
+
+            if -ph * delta >= threshold:
+                pruned[(prev, word)] = count
+
+    return pruned
+
+def quantize(values, bits=8):
+    """
+    Quantizes a list of floats to the given number of bits by splitting
+    the sorted distinct values into equally sized bins, each represented by
+    the mean of its values. Returns an array of codes and the codebook to
+    decode them with; if bits is None the values are kept as doubles and
+    no codebook is returned.
+    """
+    if bits is None:
+        return array('d', values), None
+    if bits not in (8, 16):
+        raise ValueError("Can only quantize to 8 or 16 bits")
+
+    ordered = sorted(set(v for v in values if not math.isinf(v)))
+    nbins   = min(2 ** bits - 1, len(ordered)) or 1
+    bounds, codebook = [], []
+    for idx in xrange(nbins):
+        members = ordered[idx * len(ordered) // nbins:(idx + 1) * len(ordered) // nbins]
+        if members:
+            bounds.append(members[-1])
+            codebook.append(sum(members) / len(members))
+
+    # The last code is reserved for log(0), e.g. a backoff weight of zero.
+    codebook.append(float('-inf'))
+    infinite = len(codebook) - 1
+
+    codes = array('B' if bits == 8 else 'H')
+    for value in values:
+        if math.isinf(value):
+            codes.append(infinite)
+        else:
+            codes.append(min(bisect_left(bounds, value), len(bounds) - 1))
+    return codes, codebook
+
+def logarithm(p):
+    if p > 0:
+        return math.log(p)
+    return float('-inf')
+
+def packed_typecode(V):
+    """
+    Returns the array typecode of the largest unsigned integer available
+    (Python 2 has no 'Q'), raising a ValueError if it cannot hold every
+    packed bigram of a vocabulary of size V.
+    """
+    try:
+        typecode = array('Q').typecode
+    except ValueError:
+        typecode = 'L'
+    if V * V > 2 ** (8 * array(typecode).itemsize):
+        raise ValueError("Cannot pack the bigrams of %i words into %i bytes" % (V, array(typecode).itemsize))
+    return typecode
+
+class CompactBigramModel(object):
+    """
+    A read only backoff bigram model stored in sorted arrays. Words are
+    identified by their position in the sorted vocabulary, and bigrams by
+    the packed integer prev * V + word, which is looked up with a binary
+    search. The log probabilities and backoff weights are quantized to the
+    number of bits specified (or kept as doubles if bits is None).
+
+    The probabilities are always estimated from the full bigram counts. To
+    build a pruned model, pass the pruned bigrams as keep: the kept bigrams
+    retain the discounted probabilities of the full model and only the
+    backoff weights are recomputed, which is the model that entropy_prune
+    scores. An existing estimator of the counts can be passed in to be
+    reused.
+
+    The model also behaves like a read only dictionary of the probability
+    of every bigram it stores, so it can be set as the ptable of the
+    generators and discounters.
+    """
+
+    def __init__(self, unigrams, bigrams, bits=8, K=5, keep=None, estimator=None):
+        self.bits  = bits
+        self.vocab = sorted(unigrams)
+
+        model = estimator or KatzEstimator(unigrams, bigrams, K)
+        V = len(self.vocab)
+        typecode = packed_typecode(V)
+
+        unigram_logs = [logarithm(model.unigram(word)) for word in self.vocab]
+        backoff_logs = []
+        packed = []
+        for wid, prev in enumerate(self.vocab):
+            probs, beta, seen = model.conditional(prev)
+            if keep is not None:
+                probs = dict((word, p) for word, p in probs.iteritems() if (prev, word) in keep)
+                beta = max(1.0 - sum(probs.values()), 0.0)
+                seen = sum(model.unigram(word) for word in probs)
+            backoff_logs.append(logarithm(backoff(beta, seen)))
+            for word, p in probs.items():
+                packed.append((wid * V + self.wordid(word), logarithm(p)))
+        packed.sort()
+
+        self.packed = array(typecode, [key for key, _ in packed])
+        self.unigram_codes, self.unigram_book = quantize(unigram_logs, bits)
+        self.backoff_codes, self.backoff_book = quantize(backoff_logs, bits)
+        self.bigram_codes,  self.bigram_book  = quantize([lp for _, lp in packed], bits)
+
+    def wordid(self, word):
+        """
+        Returns the position of the word in the vocabulary, or None.
+        """
+        idx = bisect_left(self.vocab, word)
+        if idx < len(self.vocab) and self.vocab[idx] == word:
+            return idx
+        return None
+
+    def decode(self, codes, codebook, idx):
+        if codebook is None:
+            return codes[idx]
+        return codebook[codes[idx]]
+
+    def find(self, prev, word):
+        """
+        Returns the index of the bigram in the sorted arrays, or None.
+        """
+        pid, wid = self.wordid(prev), self.wordid(word)
+        if pid is None or wid is None:
+            return None
+        key = pid * len(self.vocab) + wid
+        idx = bisect_left(self.packed, key)
+        if idx < len(self.packed) and self.packed[idx] == key:
+            return idx
+        return None
+
+    def logprob(self, prev, word):
+        """
+        Returns the natural log probability of word following prev, backing
+        off to the unigram probability for bigrams that were not stored.
+        """
+        wid = self.wordid(word)
+        if wid is None:
+            return float('-inf')
+        idx = self.find(prev, word)
+        if idx is not None:
+            return self.decode(self.bigram_codes, self.bigram_book, idx)
+        unigram = self.decode(self.unigram_codes, self.unigram_book, wid)
+        pid = self.wordid(prev)
+        if pid is None:
+            return unigram
+        return self.decode(self.backoff_codes, self.backoff_book, pid) + unigram
+
+    def size(self):
+        """
+        Returns the number of bytes used by the arrays and codebooks, along
+        with the vocabulary (the list and every word in it).
+        """
+        nbytes = sys.getsizeof(self.vocab) + sum(sys.getsizeof(word) for word in self.vocab)
+        for arr in (self.packed, self.unigram_codes, self.backoff_codes, self.bigram_codes):
+            nbytes += arr.itemsize * len(arr)
+        for book in (self.unigram_book, self.backoff_book, self.bigram_book):
+            if book is not None:
+                nbytes += 8 * len(book)
+        return nbytes
+
+    def __len__(self):
+        return len(self.packed)
+
+    def __iter__(self):
+        V = len(self.vocab)
+        for key in self.packed:
+            yield (self.vocab[key // V], self.vocab[key % V])
+
+    def __contains__(self, bigram):
+        return self.find(*bigram) is not None
+
+    def __getitem__(self, bigram):
+        idx = self.find(*bigram)
+        if idx is None:
+            raise KeyError(bigram)
+        return math.exp(self.decode(self.bigram_codes, self.bigram_book, idx))
+
+    def get(self, bigram, default=None):
+        try:
+            return self[bigram]
+        except KeyError:
+            return default
+
+    def items(self):
+        for idx, bigram in enumerate(self):
+            yield bigram, math.exp(self.decode(self.bigram_codes, self.bigram_book, idx))
+
+def perplexity(model, words):
+    """
+    Computes the perplexity of the model on a sequence of held out words.
+    Words that are not in the vocabulary of the model (or that have no
+    probability) are skipped, the number skipped is returned as well.
+    """
+    logprob, count, skipped = 0.0, 0, 0
+    prev = None
+    for word in words:
+        if prev is not None:
+            lp = model.logprob(prev, word)
+            if math.isinf(lp):
+                skipped += 1
+            else:
+                logprob += lp
+                count += 1
+        prev = word
+    return math.exp(-logprob / count) if count else float('inf'), skipped
+
+def evaluate(unigrams, bigrams, heldout, thresholds=(1e-7, 1e-6, 1e-5), cutoffs=(2,), bits=(16, 8)):
+    """
+    Builds a compact model for every pruning and quantization setting and
+    reports the number of bigrams, size in bytes and perplexity on the held
+    out words, along with the change in perplexity from the full model.
+    """
+    heldout   = list(heldout)
+    estimator = KatzEstimator(unigrams, bigrams)
+    baseline  = CompactBigramModel(unigrams, bigrams, bits=None, estimator=estimator)
+    base_pp, _ = perplexity(baseline, heldout)
+
+    settings = [("full", None)]
+    settings += [("count >= %i" % c, count_prune(bigrams, c)) for c in cutoffs]
+    settings += [("entropy %g" % t, entropy_prune(unigrams, bigrams, t, estimator=estimator)) for t in thresholds]
+
+    report = []
+    for name, keep in settings:
+        for nbits in (None,) + tuple(bits):
+            if keep is None and nbits is None:
+                model = baseline
+            else:
+                model = CompactBigramModel(unigrams, bigrams, nbits, keep=keep, estimator=estimator)
+            pp, skipped = perplexity(model, heldout)
+            report.append({
+                'pruning': name,
+                'bits': nbits or 64,
+                'bigrams': len(model),
+                'bytes': model.size(),
+                'perplexity': pp,
+                'change': pp - base_pp,
+                'skipped': skipped,
+            })
+    return report
+
+if __name__ == "__main__":
+
+    import ngram
+
+    print "Please hold on, this could take a while..."
+
+    words = list(ngram.brown_unigrams.words())
+    split = int(len(words) * 0.9)
+    train, heldout = words[:split], words[split:]
+
+    unigrams = Frequency()
+    bigrams  = Frequency()
+    for idx, word in enumerate(train):
+        unigrams.increment(word)
+        if idx:
+            bigrams.increment((train[idx-1], word))
+
+    print "%-16s %4s %10s %12s %12s %10s" % ("pruning", "bits", "bigrams", "bytes", "perplexity", "change")
+    for row in evaluate(unigrams, bigrams, heldout):
+        print "%(pruning)-16s %(bits)4i %(bigrams)10i %(bytes)12i %(perplexity)12.2f %(change)+10.2f" % row
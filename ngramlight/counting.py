@@ -10,48 +10,253 @@
 Helper data structures for use in Homework 1
 """
 
+import heapq
+
+def count_elements(mapping, iterable):
+    """
+    Counts the elements of the iterable into the mapping, calling the bound
+    dict methods directly so that a Frequency skips the type check and the
+    bookkeeping of its __setitem__ for every element.
+    """
+    get = mapping.get
+    setitem = dict.__setitem__.__get__(mapping)
+    for elem in iterable:
+        setitem(elem, get(elem, 0) + 1)
+
 class Frequency(dict):
     """
     Wraps a hash map for calculating frequencies and counting.
+
+    The total of all counts is kept up to date as counts change, and the
+    maximum and minimum are cached until the counts next change.
+    Like collections.Counter, the counts can be updated in bulk from an
+    iterable or a mapping, subtracted and added together; unlike a Counter
+    looking up a missing key raises a C{KeyError}.
     """
 
+    _total = 0
+    _stats = None
+
+    def __init__(self, *args, **kwargs):
+        super(Frequency, self).__init__()
+        self.update(*args, **kwargs)
+
+    def __reduce__(self):
+        """
+        Pickles and copies only the counts, so the total is recomputed once
+        when they are restored rather than replayed on top of a saved total.
+        """
+        return (self.__class__, (dict(self),))
+
     def __setitem__(self, key, val):
         """
-        Only allows integers to be set on the dictionary, raises a 
+        Only allows integers to be set on the dictionary, raises a
         C{ValueError} if some other type attempts to be set on it.
         """
-        if not isinstance(val, int):
+        if not isinstance(val, (int, long)):
             raise ValueError("Set only frequency data as integers")
-        super(Frequency, self).__setitem__(key,val)
+        self._total += val - dict.get(self, key, 0)
+        self._stats = None
+        dict.__setitem__(self, key, val)
 
-    def increment(self, key):
+    def __delitem__(self, key):
+        self._total -= dict.__getitem__(self, key)
+        self._stats = None
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
         if key in self:
-            self[key] += 1
-        else:
-            self[key] = 1
+            self._total -= dict.__getitem__(self, key)
+            self._stats = None
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, val = dict.popitem(self)
+        self._total -= val
+        self._stats = None
+        return key, val
+
+    def setdefault(self, key, default=0):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def clear(self):
+        dict.clear(self)
+        self._total = 0
+        self._stats = None
+
+    def copy(self):
+        return self.__class__(self)
+
+    def increment(self, key):
+        dict.__setitem__(self, key, dict.get(self, key, 0) + 1)
+        self._total += 1
+        self._stats = None
     incr = increment
 
     def decrement(self, key):
         if key in self:
-            self[key] -= 1
+            dict.__setitem__(self, key, dict.__getitem__(self, key) - 1)
+            self._total -= 1
+            self._stats = None
         else:
             self[key] = 0
     decr = decrement
 
+    def merge(self, counts, sign=1):
+        """
+        Adds (or with a negative sign, subtracts) the counts of another
+        mapping to the counts in this frequency. Raises a C{ValueError}
+        (before changing any count) if the mapping has non integer counts.
+        """
+        for val in counts.itervalues():
+            if not isinstance(val, (int, long)):
+                raise ValueError("Set only frequency data as integers")
+        self._merge(counts, sign)
+
+    def _merge(self, counts, sign=1):
+        """
+        Merges counts that are known to be integers, e.g. counted elements.
+        """
+        if not counts:
+            return
+        if not self and sign > 0:
+            # Nothing to add to, so let the dictionary copy the counts.
+            dict.update(self, counts)
+            self._total = sum(dict.itervalues(self))
+        else:
+            get = self.get
+            total = 0
+            for key, val in counts.iteritems():
+                val *= sign
+                dict.__setitem__(self, key, get(key, 0) + val)
+                total += val
+            self._total += total
+        self._stats = None
+
+    def update(self, *args, **kwargs):
+        """
+        Like collections.Counter, adds counts from a mapping or counts the
+        elements of an iterable, rather than replacing the counts. If the
+        frequency is empty the elements are counted directly into it,
+        otherwise into a dict of the new counts that is merged in one pass.
+        """
+        if len(args) > 1:
+            raise TypeError("Expected at most 1 argument, got %i" % len(args))
+        if args:
+            iterable = args[0]
+            if isinstance(iterable, dict):
+                self.merge(iterable)
+            elif not self:
+                try:
+                    count_elements(self, iterable)
+                finally:
+                    # Keep the total correct even if the iterable fails.
+                    self._total = sum(self.itervalues())
+                    self._stats = None
+            else:
+                counts = {}
+                count_elements(counts, iterable)
+                self._merge(counts)
+        if kwargs:
+            self.update(kwargs)
+
+    def subtract(self, *args, **kwargs):
+        """
+        Like collections.Counter, subtracts the counts of a mapping or of
+        the elements of an iterable; counts may become zero or negative.
+        """
+        if len(args) > 1:
+            raise TypeError("Expected at most 1 argument, got %i" % len(args))
+        if args:
+            iterable = args[0]
+            if isinstance(iterable, dict):
+                self.merge(iterable, -1)
+            else:
+                counts = {}
+                count_elements(counts, iterable)
+                self._merge(counts, -1)
+        if kwargs:
+            self.subtract(kwargs)
+
+    def __add__(self, other):
+        """
+        Adds the counts of two frequencies, keeping only positive counts.
+        """
+        result = self.copy()
+        result.merge(other)
+        return result.positive()
+
+    def __sub__(self, other):
+        """
+        Subtracts the counts of two frequencies, keeping only positive counts.
+        """
+        result = self.copy()
+        result.merge(other, -1)
+        return result.positive()
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
+    def __isub__(self, other):
+        self.merge(other, -1)
+        return self
+
+    def positive(self):
+        """
+        Returns a new frequency with only the positive counts.
+        """
+        return self.__class__(dict((key, val) for key, val in self.iteritems() if val > 0))
+
+    def most_common(self, n=None):
+        """
+        Lists the n most common keys and their counts, from the most
+        common to the least, or all of them if n is None.
+        """
+        if n is None:
+            return sorted(self.iteritems(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(n, self.iteritems(), key=lambda item: item[1])
+
+    def elements(self):
+        """
+        Iterates over every key, repeated as many times as its count.
+        """
+        for key, val in self.iteritems():
+            for _ in xrange(val):
+                yield key
+
+    def stats(self):
+        """
+        Computes the maximum and minimum in a single pass over the counts,
+        caching them until the counts next change.
+        """
+        if not self:
+            raise ValueError("Cannot compute statistics of an empty frequency")
+        if self._stats is None:
+            items = self.iteritems()
+            maxkey, maxval = minkey, minval = next(items)
+            for key, val in items:
+                if val > maxval:
+                    maxkey, maxval = key, val
+                elif val < minval:
+                    minkey, minval = key, val
+            self._stats = ((maxkey, maxval), (minkey, minval))
+        return self._stats
+
     def maximum(self):
-        key = max(self, key=self.get)
-        return key, self[key]
+        return self.stats()[0]
 
     def minimum(self):
-        key = min(self, key=self.get)
-        return key, self[key]
+        return self.stats()[1]
 
     def average(self):
-        return sum(self.values()) / len(self)
+        return self._total / len(self)
     mean = average
 
     def total(self):
         """
         Returns the total counts added to the frequency.
         """
-        return sum([val for val in self.values()])
+        return self._total
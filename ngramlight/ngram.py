@@ -13,57 +13,100 @@ indvidual words, then creats an N-Gram from them.
 """
 
 import os
+from itertools import chain, islice, izip
 from reader import BrownNavigator, PotterNavigator
 from counting import Frequency
+from utils import Normalizer
 
-BROWN_CORPUS  = BrownNavigator(os.environ['BROWN_CORPUS']) 
-POTTER_CORPUS = PotterNavigator(os.environ['POTTER_CORPUS'])
+# The corpora are only available if their paths are set in the environment
+BROWN_CORPUS  = BrownNavigator(os.environ['BROWN_CORPUS']) if 'BROWN_CORPUS' in os.environ else None
+POTTER_CORPUS = PotterNavigator(os.environ['POTTER_CORPUS']) if 'POTTER_CORPUS' in os.environ else None
 
 class NGramCounter(object):
     """
     Takes as input a corpus, and then updates an internal frequency with
     word counts from the corpus.
+
+    By default N-Grams are windowed over the whole corpus, so they may span
+    sentences and files; if boundaries is True, N-Grams are only windowed
+    within each sentence (from <s> to </s>).
+
+    The words are normalized by the normalizer, by default only making them
+    lowercase; see utils.Normalizer for removing punctuation or stopwords.
     """
 
-    def __init__(self, corpus, N=1):
+    def __init__(self, corpus, N=1, boundaries=False, normalizer=None):
         self.corpus = corpus
         self.frequency = Frequency()
         self.N = N
+        self.boundaries = boundaries
+        self.normalizer = normalizer or Normalizer()
 
-    def words(self):
+    def documents(self):
         """
-        A generator that goes through all the words in the corpus, makes
-        them lowercase and (possibly) could remove punctuation or stopwords
+        A generator that returns the list of normalized words in each
+        document of the corpus.
         """
         for reader in self.corpus:
-            for word in reader.words():
-                word = word.strip()
-                if word:
-                    yield word.lower()
+            yield self.normalizer(reader.words())
+
+    def words(self):
+        """
+        A generator that goes through all the words in the corpus, and
+        normalizes them (by default making them lowercase).
+        """
+        return chain.from_iterable(self.documents())
+
+    def window(self, tokens):
+        """
+        Returns an iterator of the N-Grams in a list of tokens, by zipping
+        the list with itself offset by 1 to N-1 tokens.
+        """
+        return izip(*[islice(tokens, idx, None) for idx in xrange(self.N)])
+
+    def batches(self):
+        """
+        Returns an iterator of the N-Grams of each document in the corpus,
+        carrying the last N-1 words over to the next document unless the
+        N-Grams respect sentence boundaries.
+        """
+        carry = []
+        for tokens in self.documents():
+            if self.N == 1:
+                yield tokens
+            elif self.boundaries:
+                yield chain.from_iterable(self.window(sentence) for sentence in sentences(tokens))
+            else:
+                tokens = carry + tokens
+                yield self.window(tokens)
+                carry = tokens[1-self.N:]
 
     def __iter__(self):
         """
         Expects a generator to return the specific ngram to save in the
         frequency counts.
         """
-        if self.N == 1:
-            # Special case for Unigrams
-            for word in self.words(): yield word
-        else:
-            ngram = []
-            for word in self.words():
-                if len(ngram) < self.N:
-                    ngram.append(word)
-                if len(ngram) == self.N:
-                    yield tuple(ngram)
-                    ngram = ngram[1:]
+        return chain.from_iterable(self.batches())
 
     def count(self):
         if not self.frequency:
-            for ngram in self:
-                self.frequency.increment(ngram)
+            self.frequency.update(self)
         return self.frequency
 
+def sentences(tokens):
+    """
+    Splits a list of tokens after every end of sentence marker, searching
+    for the markers with list.index rather than testing every token.
+    """
+    start = 0
+    while start < len(tokens):
+        try:
+            end = tokens.index("</s>", start) + 1
+        except ValueError:
+            end = len(tokens)
+        yield tokens[start:end]
+        start = end
+
 def brown_factory(N):
     """
     A factory for creating N-Gram counters on the Brown Corpus
@@ -0,0 +1,130 @@
+"""
+Overlaps reading the corpus from disk with parsing it, and parsing with
+counting, by running the ingest as a pipeline of three stages:
+
+    1. A background thread reads the upcoming documents into memory.
+    2. A pool of worker processes parses and tokenizes the documents.
+    3. The caller (e.g. an NGramCounter) consumes the parsed documents.
+
+The stages are connected by bounded queues, so that a slow stage holds up
+the ones before it rather than letting the documents pile up in memory.
+The documents are yielded in the same order as the wrapped navigator, so
+counting a Pipeline gives the same counts as counting the navigator.
+
+    counter = NGramCounter(Pipeline(BrownNavigator(path)), N=2)
+"""
+
+import threading
+import multiprocessing
+from Queue import Queue, Full
+from collections import deque
+from StringIO import StringIO
+
+# Marks the end of the documents read by the prefetch thread.
+DONE = object()
+
+def parse(task):
+    """
+    Worker for the parse stage, tokenizes the contents of a document with
+    the reader class that read it.
+    """
+    reader_class, path, data = task
+    with reader_class(path, StringIO(data)) as reader:
+        return list(reader.words())
+
+class ParsedDocument(object):
+    """
+    Stands in for a CorpusReader whose words have already been parsed, so
+    that it can be consumed by an NGramCounter.
+    """
+
+    def __init__(self, path, words):
+        self.path = path
+        self._words = words
+
+    def words(self):
+        return iter(self._words)
+
+class Pipeline(object):
+    """
+    Wraps a CorpusNavigator to read up to prefetch documents ahead in a
+    background thread and to parse them in a pool of processes (or in the
+    calling thread if processes is 0), with at most inflight documents
+    being parsed at once.
+    """
+
+    def __init__(self, navigator, prefetch=8, processes=None, inflight=None):
+        self.navigator = navigator
+        self.prefetch  = prefetch
+        self.processes = multiprocessing.cpu_count() if processes is None else processes
+        self.inflight  = inflight or 2 * max(self.processes, 1)
+
+    def list(self):
+        return self.navigator.list()
+
+    def read(self, queue, stop):
+        """
+        The prefetch stage, reads every document of the navigator into the
+        queue until it is exhausted or the pipeline is stopped. Errors are
+        passed through the queue to be raised by the consumer.
+        """
+        def put(item):
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        try:
+            for reader in self.navigator:
+                if not put((reader.__class__, reader.path, reader.read())):
+                    return
+        except Exception as e:
+            put(e)
+        put(DONE)
+
+    def documents(self, queue):
+        while True:
+            item = queue.get()
+            if item is DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def __iter__(self):
+        """
+        Returns a ParsedDocument for each document in the navigator, in the
+        same order as the navigator.
+        """
+        # Fork the workers before starting the prefetch thread, since forking
+        # while another thread holds a lock can deadlock the children.
+        pool = multiprocessing.Pool(self.processes) if self.processes else None
+
+        queue = Queue(self.prefetch)
+        stop  = threading.Event()
+        reader = threading.Thread(target=self.read, args=(queue, stop))
+        reader.daemon = True
+        reader.start()
+
+        try:
+            if pool is None:
+                for task in self.documents(queue):
+                    yield ParsedDocument(task[1], parse(task))
+                return
+
+            pending = deque()
+            for task in self.documents(queue):
+                pending.append((task[1], pool.apply_async(parse, (task,))))
+                if len(pending) >= self.inflight:
+                    path, result = pending.popleft()
+                    yield ParsedDocument(path, result.get())
+            while pending:
+                path, result = pending.popleft()
+                yield ParsedDocument(path, result.get())
+        finally:
+            stop.set()
+            if pool is not None:
+                pool.terminate()
@@ -11,34 +11,100 @@ Opens a Corpus and yields the text for reading, splitting the text into
 either paragraphs, sentences, or words using a means specific to the corpus
 the program is reading. 
 
+Corpus files may be stored compressed (gzip, bz2 or xz), bundled as the
+members of a tar archive, or as JSON lines shards; the readers stream them
+directly without unpacking to disk first.
+
 @note: The HTML files in Harry Potter are preprocessed by an HTML DOM 
 processor called BeautifulSoup.
 """
 
 import os
 import re
+import bz2
+import gzip
+import json
+import tarfile
+import multiprocessing
+from collections import deque
+from StringIO import StringIO
 from utils import directory
 from bs4 import BeautifulSoup
 
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# Size of the read buffer used when opening corpus files on disk.
+BUFFER_SIZE = 1024 * 1024
+
+def open_plain(path):
+    return open(path, 'rb', BUFFER_SIZE)
+
+def open_gzip(path):
+    return gzip.open(path, 'rb')
+
+def open_bz2(path):
+    return bz2.BZ2File(path, 'rb', BUFFER_SIZE)
+
+# Maps a file extension to the function that opens a stream on it.
+OPENERS = {
+    '.gz':  open_gzip,
+    '.bz2': open_bz2,
+}
+
+# Extensions of xz files, which can only be read if lzma is available.
+XZ_EXTENSIONS = ('.xz', '.txz')
+
+if lzma is not None:
+    for ext in XZ_EXTENSIONS:
+        OPENERS[ext] = lambda path: lzma.LZMAFile(path, 'rb')
+
+def isxz(path):
+    return os.path.splitext(path)[1].lower() in XZ_EXTENSIONS
+
+def stream(path):
+    """
+    Opens the file at path for reading in binary mode, decompressing it on
+    the fly if its extension is one of the known compression formats.
+    Raises an C{IOError} for xz files if lzma is not installed, rather
+    than reading the compressed bytes.
+    """
+    if lzma is None and isxz(path):
+        raise IOError("Cannot decompress %s, install backports.lzma to read xz files" % path)
+    ext = os.path.splitext(path)[1].lower()
+    return OPENERS.get(ext, open_plain)(path)
+
 class CorpusReader(object):
     """
     A file-like object that reads every file from the corpus and exposes
     various methods for handling and manipulating the text. This is a 
     wrapper around a file object with an embedded path.
+
+    If a file-like object is passed in, it is read instead of the path,
+    which is then only used as the name of the document (e.g. the name of
+    a member in an archive).
     """
 
-    def __init__(self, abspath):
+    def __init__(self, abspath, fileobj=None):
         self.path = abspath
+        self.fileobj = fileobj
         self.open()
 
     def open(self):
         """
-        Opens the file on the file system.
+        Opens the file on the file system, decompressing it if required.
         """
         if hasattr(self, 'text'):
             raise IOError("Must close the reader before you can open it again.")
+        elif self.fileobj is not None:
+            self.text = self.fileobj
         else:
-            self.text = open(self.path, 'rb')
+            self.text = stream(self.path)
         return self
 
     def close(self):
@@ -146,14 +212,288 @@ class CorpusNavigator(object):
                 if self.isMasked(name):
                     yield name
 
+    def readers(self, fname):
+        """
+        Returns an open CorpusReader object for every document contained
+        in the listed file; on disk this is simply the file itself.
+        """
+        with self.reader_class(self.abspath(fname)) as reader:
+            yield reader
+
     def __iter__(self):
         """
         Returns an open CorpusReader object for each file that is listed.
         """
         for fname in self.list():
-            with self.reader_class(self.abspath(fname)) as reader:
+            for reader in self.readers(fname):
                 yield reader
 
+    def locate(self):
+        """
+        Lists the locations of the documents handed to the workers by map,
+        which for files on disk are simply their names.
+        """
+        return self.list()
+
+    def located(self, location):
+        """
+        Returns the readers for a location listed by locate.
+        """
+        return self.readers(location)
+
+    def map(self, func, processes=None, chunksize=8):
+        """
+        Applies func to every reader in the corpus, reading the listed files
+        in parallel with a pool of worker processes. The navigator and the
+        function are sent once to each worker, which is then handed chunks
+        of document locations. The function must be importable at the module
+        level so it can be sent to the workers. Results are yielded in the
+        same order as iterating the navigator.
+        """
+        pool = multiprocessing.Pool(processes, init_worker, (self, func))
+        try:
+            for results in pool.imap(map_located, chunks(self.locate(), chunksize)):
+                for result in results:
+                    yield result
+        finally:
+            pool.terminate()
+
+# The navigator and function of a worker process started by map.
+WORKER = {}
+
+def init_worker(navigator, func):
+    WORKER['navigator'] = navigator
+    WORKER['func'] = func
+
+def map_located(locations):
+    """
+    Worker for CorpusNavigator.map, applies the function to every reader
+    of a chunk of document locations.
+    """
+    navigator, func = WORKER['navigator'], WORKER['func']
+    return [func(reader) for location in locations for reader in navigator.located(location)]
+
+def map_contents(contents):
+    """
+    Worker for TarNavigator.map on compressed archives, applies the function
+    to readers on the contents of a chunk of members.
+    """
+    navigator, func = WORKER['navigator'], WORKER['func']
+    results = []
+    for name, data in contents:
+        with navigator.reader_class(name, StringIO(data)) as reader:
+            results.append(func(reader))
+    return results
+
+def chunks(items, size):
+    """
+    Groups an iterable into lists of at most size items.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class TarNavigator(CorpusNavigator):
+    """
+    Reads the documents of a corpus directly out of a (possibly compressed)
+    tar archive, rather than from a directory. The file mask is matched
+    against the base name of each member, and members are handed to the
+    reader class as file-like objects so no temporary files are written.
+
+    A compressed archive cannot be read at random, looking up a member by
+    name decompresses the archive from the start; iterate through it (or
+    use map, which streams it) rather than using readers.
+    """
+
+    def __init__(self, archive, filemask=['*'], ignoreHidden=True, reader_class=None):
+        super(TarNavigator, self).__init__(os.path.dirname(os.path.abspath(archive)), filemask, ignoreHidden)
+        self.archive = archive
+        self._tarfile = None
+        self._xz = None
+        self._raw = None
+        if reader_class is not None:
+            self.reader_class = reader_class
+
+    @property
+    def compressed(self):
+        """
+        Whether the archive is compressed, as detected by tarfile (which
+        only leaves an uncompressed archive as a plain file).
+        """
+        return not isinstance(self.tarfile.fileobj, file)
+
+    def open(self, mode):
+        """
+        Opens the archive for random access ('r') or as a stream ('r|'),
+        letting tarfile detect the compression. Python 2 tarfile cannot
+        read xz, so xz archives are decompressed by lzma; the decompressing
+        stream is returned as well so that it can be closed, or None.
+        """
+        if isxz(self.archive):
+            fileobj = stream(self.archive)
+            return tarfile.open(fileobj=fileobj, mode='r:' if mode == 'r' else 'r|'), fileobj
+        return tarfile.open(self.archive, 'r:*' if mode == 'r' else 'r|*'), None
+
+    @property
+    def tarfile(self):
+        """
+        Lazily opens the archive, so that each worker process opens its own.
+        """
+        if self._tarfile is None:
+            self._tarfile, self._xz = self.open('r')
+        return self._tarfile
+
+    @property
+    def readme(self):
+        for member in self.tarfile.getmembers():
+            if os.path.basename(member.name) == "README":
+                return member.name
+        return None
+
+    def abspath(self, fname):
+        """
+        Returns the member of the archive with the given name.
+        """
+        try:
+            member = self.tarfile.getmember(fname)
+        except KeyError:
+            member = None
+        if member is not None and member.isfile():
+            return member
+        raise OSError("%s is not a valid member of %s" % (fname, self.archive))
+
+    def list(self):
+        """
+        Lists the names of the regular file members of the archive that
+        are masked, walking every directory in the archive.
+        """
+        for member in self.tarfile.getmembers():
+            if member.isfile() and self.isMasked(os.path.basename(member.name)):
+                yield member.name
+
+    def readers(self, fname):
+        member = self.abspath(fname)
+        with self.reader_class(fname, self.tarfile.extractfile(member)) as reader:
+            yield reader
+
+    def locate(self):
+        """
+        Lists the name, offset and size of the data of every masked member,
+        so that the workers of map can read them without looking them up.
+        """
+        for member in self.tarfile.getmembers():
+            if member.isfile() and self.isMasked(os.path.basename(member.name)):
+                yield member.name, member.offset_data, member.size
+
+    def located(self, location):
+        """
+        Reads the data of a member directly from its offset in the archive.
+        """
+        name, offset, size = location
+        if self._raw is None:
+            self._raw = open_plain(self.archive)
+        self._raw.seek(offset)
+        with self.reader_class(name, StringIO(self._raw.read(size))) as reader:
+            yield reader
+
+    def map(self, func, processes=None, chunksize=8):
+        """
+        Applies func to every reader in the archive in a pool of worker
+        processes. Uncompressed archives are read at random by the workers,
+        while compressed archives are streamed in a single pass by this
+        process and only the parsing is done in parallel, with at most two
+        chunks per worker waiting to be processed.
+        """
+        if not self.compressed:
+            for result in super(TarNavigator, self).map(func, processes, chunksize):
+                yield result
+            return
+
+        pool = multiprocessing.Pool(processes, init_worker, (self, func))
+        try:
+            inflight = 2 * (processes or multiprocessing.cpu_count())
+            contents = ((reader.path, reader.read()) for reader in self)
+            pending = deque()
+            for chunk in chunks(contents, chunksize):
+                pending.append(pool.apply_async(map_contents, (chunk,)))
+                if len(pending) >= inflight:
+                    for result in pending.popleft().get():
+                        yield result
+            while pending:
+                for result in pending.popleft().get():
+                    yield result
+        finally:
+            pool.terminate()
+
+    def __iter__(self):
+        """
+        Streams through the archive in a single pass, so that compressed
+        archives are never rewound to look up a member.
+        """
+        archive, fileobj = self.open('r|')
+        try:
+            for member in archive:
+                if member.isfile() and self.isMasked(os.path.basename(member.name)):
+                    with self.reader_class(member.name, archive.extractfile(member)) as reader:
+                        yield reader
+        finally:
+            archive.close()
+            if fileobj is not None:
+                fileobj.close()
+
+    def close(self):
+        if self._tarfile is not None:
+            self._tarfile.close()
+            self._tarfile = None
+        if self._xz is not None:
+            self._xz.close()
+            self._xz = None
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_tarfile'] = None
+        state['_xz'] = None
+        state['_raw'] = None
+        return state
+
+class JSONLinesNavigator(CorpusNavigator):
+    """
+    Reads a directory of JSON lines shards (which may be compressed), in
+    which every line is a JSON object with the text of a document in the
+    specified field. Each document is handed to the reader class as an
+    in-memory file-like object.
+    """
+
+    def __init__(self, dirpath, field="text", filemask=['*.jsonl*'], ignoreHidden=True, reader_class=None):
+        super(JSONLinesNavigator, self).__init__(dirpath, filemask, ignoreHidden)
+        self.field = field
+        if reader_class is not None:
+            self.reader_class = reader_class
+
+    def readers(self, fname):
+        """
+        Returns an open reader for every document in the shard.
+        """
+        with stream(self.abspath(fname)) as shard:
+            for idx, line in enumerate(shard):
+                line = line.strip()
+                if not line:
+                    continue
+                text = json.loads(line)[self.field]
+                if isinstance(text, unicode):
+                    text = text.encode('utf-8')
+                name = "%s:%i" % (fname, idx)
+                with self.reader_class(name, StringIO(text)) as reader:
+                    yield reader
+
 class BrownReader(CorpusReader):
     """
     A reader specifically for files in the Brown corpus, formatted for the
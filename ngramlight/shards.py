@@ -0,0 +1,233 @@
+"""
+Builds N-Gram counts across many machines in a map/reduce style. Each
+machine counts a shard of the corpus (selected by a stable hash of the
+file names, or by an explicit list of files) into a partial count file,
+then any number of partials are merged into the final counts.
+
+A partial count file is a text file (gzipped if it ends in .gz) that
+starts with its own vocabulary, sorted so that the ID of each word is its
+position in the vocabulary, followed by the N-Grams as lists of IDs in
+sorted order along with their counts. Because the IDs follow the order of
+the words, the merge can remap every partial to a shared vocabulary and
+still stream through them in sorted order, so only the vocabularies are
+kept in memory.
+
+Only files that exist on a shared filesystem are used to coordinate, e.g.
+
+    python shards.py count -c brown -N 2 -s 0 -n 4 $BROWN_CORPUS part0.gz
+    python shards.py merge brown-bigrams.gz part0.gz part1.gz ...
+
+@note: Unless the counts respect sentence boundaries (-b), the N-Grams
+    that span two files in different shards are not counted.
+"""
+
+import os
+import gzip
+import heapq
+import hashlib
+import tempfile
+import argparse
+from reader import stream, BrownNavigator, PotterNavigator
+from counting import Frequency
+from ngram import NGramCounter
+from utils import Normalizer, Stopwords
+
+NAVIGATORS = {
+    'brown':  BrownNavigator,
+    'potter': PotterNavigator,
+}
+
+class Shard(object):
+    """
+    Wraps a CorpusNavigator to only expose the files in the shard, either
+    the files whose name hashes to the index of this shard among count
+    shards, or the files explicitly listed. The hash is computed with MD5
+    so every machine agrees on the shard of every file.
+    """
+
+    def __init__(self, navigator, index=0, count=1, files=None):
+        if not 0 <= index < count:
+            raise ValueError("Shard index must be between 0 and %i" % (count - 1))
+        self.navigator = navigator
+        self.index = index
+        self.count = count
+        self.files = set(files) if files is not None else None
+
+    def contains(self, fname):
+        if self.files is not None:
+            return fname in self.files
+        return int(hashlib.md5(fname).hexdigest(), 16) % self.count == self.index
+
+    def list(self):
+        for fname in self.navigator.list():
+            if self.contains(fname):
+                yield fname
+
+    def __iter__(self):
+        for fname in self.list():
+            for reader in self.navigator.readers(fname):
+                yield reader
+
+def ngrams(frequency):
+    """
+    Yields each N-Gram in the frequency as a tuple, along with its count,
+    since unigrams are counted as bare words.
+    """
+    for ngram, count in frequency.items():
+        if not isinstance(ngram, tuple):
+            ngram = (ngram,)
+        yield ngram, count
+
+def writer(path, compress=False):
+    if compress:
+        return gzip.open(path, 'wb')
+    return open(path, 'wb')
+
+def write_partial(frequency, N, path):
+    """
+    Writes the frequency to a partial count file. The file is written to
+    a temporary path and renamed, so a partial that exists is complete.
+    """
+    vocab = sorted(set(word for ngram, _ in ngrams(frequency) for word in ngram))
+    ids = dict((word, idx) for idx, word in enumerate(vocab))
+    rows = sorted((tuple(ids[word] for word in ngram), count) for ngram, count in ngrams(frequency))
+    write_rows(path, N, vocab, rows)
+
+def write_rows(path, N, vocab, rows):
+    """
+    Writes the vocabulary and the sorted rows of IDs and counts to path,
+    through a temporary file that is removed if writing fails.
+    """
+    # A unique temporary file beside the output, so that nodes sharing the
+    # filesystem never write to the same temporary file.
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(tmp, 0666 & ~umask)
+    try:
+        with writer(tmp, path.endswith('.gz')) as out:
+            out.write("%i\t%i\n" % (N, len(vocab)))
+            for word in vocab:
+                out.write(word + "\n")
+            for ngram, count in rows:
+                out.write("%s\t%i\n" % (" ".join(str(idx) for idx in ngram), count))
+        os.rename(tmp, path)
+    except:
+        # Never leave a partial temporary file on the shared filesystem.
+        os.unlink(tmp)
+        raise
+
+class Partial(object):
+    """
+    Opens a partial count file, reading its header and vocabulary so that
+    the N-Grams can then be streamed from it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.text = stream(path)
+        N, size = self.text.readline().split()
+        self.N = int(N)
+        self.vocab = [self.text.readline().rstrip("\n") for _ in xrange(int(size))]
+
+    def rows(self, remap=None):
+        """
+        Yields the N-Grams as tuples of IDs with their counts, optionally
+        translating the IDs with the remap list.
+        """
+        for line in self.text:
+            ngram, count = line.split("\t")
+            ngram = [int(idx) for idx in ngram.split()]
+            if remap is not None:
+                ngram = [remap[idx] for idx in ngram]
+            yield tuple(ngram), int(count)
+
+    def close(self):
+        self.text.close()
+
+def merge(paths, output):
+    """
+    Merges the partial count files into a single count file, by remapping
+    each partial to the union of their vocabularies and summing the counts
+    of the N-Grams with a streaming merge of the sorted partials.
+    """
+    partials = [Partial(path) for path in paths]
+    try:
+        sizes = set(partial.N for partial in partials)
+        if len(sizes) != 1:
+            raise ValueError("Cannot merge partials with different N: %s" % ", ".join(str(n) for n in sizes))
+
+        vocab = sorted(set(word for partial in partials for word in partial.vocab))
+        ids = dict((word, idx) for idx, word in enumerate(vocab))
+        streams = [partial.rows([ids[word] for word in partial.vocab]) for partial in partials]
+
+        def summed():
+            current, total = None, 0
+            for ngram, count in heapq.merge(*streams):
+                if ngram != current:
+                    if current is not None:
+                        yield current, total
+                    current, total = ngram, 0
+                total += count
+            if current is not None:
+                yield current, total
+
+        write_rows(output, sizes.pop(), vocab, summed())
+    finally:
+        for partial in partials:
+            partial.close()
+
+def load(path):
+    """
+    Loads a (merged) count file into a Frequency, keyed in the same way as
+    the counts of an NGramCounter so it can be used by the generators.
+    """
+    partial = Partial(path)
+    frequency = Frequency()
+    try:
+        for ngram, count in partial.rows():
+            words = tuple(partial.vocab[idx] for idx in ngram)
+            frequency[words if partial.N > 1 else words[0]] = count
+    finally:
+        partial.close()
+    return frequency
+
+def count(args):
+    navigator = NAVIGATORS[args.corpus](args.corpus_dir)
+    shard = Shard(navigator, args.shard, args.shards, args.files)
+    normalizer = Normalizer(
+        punctuation=args.punctuation, numbers=args.numbers,
+        stopwords=Stopwords() if args.stopwords else None,
+    )
+    counter = NGramCounter(shard, args.N, args.boundaries, normalizer)
+    write_partial(counter.count(), args.N, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description="Count N-Grams in shards and merge the partial counts.")
+    commands = parser.add_subparsers(title="commands")
+
+    counting = commands.add_parser("count", help="count the N-Grams in a shard of the corpus")
+    counting.add_argument("-c", "--corpus", choices=sorted(NAVIGATORS), default="brown", help="type of the corpus")
+    counting.add_argument("-N", type=int, default=1, help="size of the N-Grams to count")
+    counting.add_argument("-s", "--shard", type=int, default=0, help="index of the shard to count")
+    counting.add_argument("-n", "--shards", type=int, default=1, help="total number of shards")
+    counting.add_argument("-b", "--boundaries", action="store_true", help="do not count N-Grams that span sentences")
+    counting.add_argument("--punctuation", action="store_true", help="strip punctuation from the words")
+    counting.add_argument("--numbers", action="store_true", help="collapse numbers into a single token")
+    counting.add_argument("--stopwords", action="store_true", help="do not count stopwords")
+    counting.add_argument("-f", "--file", dest="files", action="append", help="count this file rather than a hashed shard (repeatable)")
+    counting.add_argument("corpus_dir", help="directory containing the corpus")
+    counting.add_argument("output", help="path of the partial count file to write")
+    counting.set_defaults(func=count)
+
+    merging = commands.add_parser("merge", help="merge partial count files")
+    merging.add_argument("output", help="path of the merged count file to write")
+    merging.add_argument("partials", nargs="+", help="partial count files to merge")
+    merging.set_defaults(func=lambda args: merge(args.partials, args.output))
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ Utility classes and helper functions.
 """
 
 import os
+import re
+import string
 
 class Directory(object):
     """
@@ -48,17 +50,86 @@ class Directory(object):
 def directory(func):
     return Directory(func, func.__doc__)
 
+# Path to the stopwords list that is distributed with the library
+STOPWORDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "knowledge", "stopwords.txt")
+
 class Stopwords(object):
     """
-    Loads up the list of stopwords from an associated stopwords.text file
+    Loads up the list of stopwords from an associated stopwords.text file,
+    reading the file only once into a frozen set for quick lookups.
     """
 
-    def __init__(self, path="../knowledge/stopwords.txt"):
+    def __init__(self, path=STOPWORDS):
         self.path = path
+        self._words = None
+
+    @property
+    def words(self):
+        if self._words is None:
+            with open(self.path, 'rb') as wordfile:
+                self._words = frozenset(line.strip() for line in wordfile if line.strip())
+        return self._words
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __len__(self):
+        return len(self.words)
 
     def __iter__(self):
-        with open(self.path, 'rb') as wordfile:
-            for line in wordfile.readlines():
-                line = line.strip()
-                if line:
-                    yield line
+        return iter(self.words)
+
+class Normalizer(object):
+    """
+    Normalizes the words of a document before they are counted. Words are
+    always stripped of whitespace and dropped if empty, and optionally:
+
+        - lowercase: folds the case of every word
+        - punctuation: strips leading and trailing punctuation, dropping
+          words that are only punctuation
+        - numbers: collapses every number into a single <num> token
+        - stopwords: drops the words in the set (e.g. a Stopwords object)
+
+    The sentence markers <s> and </s> are never changed. All of the steps
+    are applied in a single pass over the words of a document.
+    """
+
+    MARKERS = frozenset(("<s>", "</s>"))
+    NUMBER  = re.compile(r"^[+-]?\d[\d,.]*$")
+
+    def __init__(self, lowercase=True, punctuation=False, numbers=False, stopwords=None):
+        self.lowercase = lowercase
+        self.punctuation = punctuation
+        self.numbers = numbers
+        self.stopwords = frozenset(stopwords) if stopwords is not None else frozenset()
+
+    def __call__(self, words):
+        """
+        Returns the list of normalized words.
+        """
+        if self.lowercase and not (self.punctuation or self.numbers or self.stopwords):
+            # The common case needs only a single comprehension.
+            return [word.lower() for word in (word.strip() for word in words) if word]
+
+        # Bind everything locally so the loop does no attribute lookups.
+        markers, stopwords = self.MARKERS, self.stopwords
+        lowercase, numbers = self.lowercase, self.numbers
+        punctuation = string.punctuation + string.whitespace if self.punctuation else None
+        number = self.NUMBER.match
+
+        normalized = []
+        append = normalized.append
+        for word in words:
+            if word in markers:
+                append(word)
+                continue
+            word = word.strip(punctuation)
+            if not word:
+                continue
+            if lowercase:
+                word = word.lower()
+            if numbers and number(word):
+                append("<num>")
+            elif word not in stopwords:
+                append(word)
+        return normalized
@@ -0,0 +1,209 @@
+"""
+Tests for the Frequency counting data structure.
+"""
+
+import os
+import sys
+import copy
+import pickle
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ngramlight"))
+
+from counting import Frequency
+
+class FrequencyCopyTests(unittest.TestCase):
+
+    def assertSameFrequency(self, copied, original):
+        self.assertIsInstance(copied, Frequency)
+        self.assertEqual(copied, original)
+        self.assertEqual(copied.total(), original.total())
+        self.assertEqual(copied.total(), sum(copied.values()))
+
+    def test_copy(self):
+        freq = Frequency('aab')
+        self.assertSameFrequency(copy.copy(freq), freq)
+        self.assertSameFrequency(freq.copy(), freq)
+
+    def test_deepcopy(self):
+        freq = Frequency('aab')
+        self.assertEqual(copy.deepcopy(freq).total(), 3)
+        self.assertSameFrequency(copy.deepcopy(freq), freq)
+
+    def test_pickle(self):
+        freq = Frequency('aab')
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertSameFrequency(pickle.loads(pickle.dumps(freq, protocol)), freq)
+
+    def test_copies_are_independent(self):
+        freq = Frequency('aab')
+        copied = copy.deepcopy(freq)
+        copied.increment('c')
+        self.assertEqual(freq.total(), 3)
+        self.assertEqual(copied.total(), 4)
+
+class FrequencyIntegerTests(unittest.TestCase):
+
+    def assertRejected(self, func, *args):
+        freq = Frequency('aab')
+        with self.assertRaises(ValueError):
+            func(freq, *args)
+        self.assertEqual(freq, Frequency('aab'))
+        self.assertEqual(freq.total(), 3)
+
+    def test_setitem(self):
+        self.assertRejected(Frequency.__setitem__, 'a', 2.5)
+
+    def test_update(self):
+        self.assertRejected(Frequency.update, {'a': 2.5})
+
+    def test_merge(self):
+        self.assertRejected(Frequency.merge, {'a': 2.5})
+        self.assertRejected(Frequency.subtract, {'a': 2.5})
+
+    def test_inplace_operators(self):
+        self.assertRejected(Frequency.__iadd__, {'a': 2.5})
+        self.assertRejected(Frequency.__isub__, {'a': 2.5})
+        self.assertRejected(Frequency.__add__, {'a': 2.5})
+
+    def test_empty_fast_path(self):
+        freq = Frequency()
+        with self.assertRaises(ValueError):
+            freq += {'a': 2.5}
+        self.assertEqual(freq, {})
+        self.assertEqual(freq.total(), 0)
+
+class FrequencyTotalTests(unittest.TestCase):
+
+    def assertTotal(self, freq):
+        self.assertEqual(freq.total(), sum(freq.values()))
+
+    def test_increment_and_decrement(self):
+        freq = Frequency()
+        for key in 'abca':
+            freq.increment(key)
+        self.assertEqual(freq.total(), 4)
+        freq.decrement('a')
+        freq.decrement('z')
+        self.assertEqual(freq['z'], 0)
+        self.assertEqual(freq.total(), 3)
+        self.assertTotal(freq)
+
+    def test_setitem_replaces_count(self):
+        freq = Frequency('aab')
+        freq['a'] = 5
+        freq['c'] = 1
+        self.assertEqual(freq.total(), 7)
+        self.assertTotal(freq)
+
+    def test_removal(self):
+        freq = Frequency('aabbbcd')
+        del freq['a']
+        self.assertEqual(freq.total(), 5)
+        self.assertEqual(freq.pop('b'), 3)
+        self.assertEqual(freq.pop('missing', 0), 0)
+        self.assertEqual(freq.total(), 2)
+        key, val = freq.popitem()
+        self.assertEqual(freq.total(), 2 - val)
+        self.assertTotal(freq)
+        freq.clear()
+        self.assertEqual(freq.total(), 0)
+
+    def test_subtract(self):
+        freq = Frequency('aabbb')
+        freq.subtract('abc')
+        self.assertEqual(freq, {'a': 1, 'b': 2, 'c': -1})
+        freq.subtract({'b': 2})
+        self.assertEqual(freq['b'], 0)
+        self.assertEqual(freq.total(), 0)
+        self.assertTotal(freq)
+
+    def test_add_and_sub(self):
+        first, second = Frequency('aab'), Frequency('abbc')
+        self.assertEqual(first + second, {'a': 3, 'b': 3, 'c': 1})
+        self.assertEqual((first + second).total(), 7)
+        self.assertEqual(first - second, {'a': 1})
+        self.assertEqual((first - second).total(), 1)
+        self.assertEqual(first.total(), 3)
+
+        first += second
+        self.assertEqual(first.total(), 7)
+        first -= Frequency('aaaa')
+        self.assertEqual(first['a'], -1)
+        self.assertTotal(first)
+
+class FrequencyUpdateTests(unittest.TestCase):
+
+    def test_update_from_iterable(self):
+        freq = Frequency()
+        freq.update(iter(['a', 'b', 'a']))
+        self.assertEqual(freq, {'a': 2, 'b': 1})
+        self.assertEqual(freq.total(), 3)
+        freq.update('bc')
+        self.assertEqual(freq, {'a': 2, 'b': 2, 'c': 1})
+        self.assertEqual(freq.total(), 5)
+
+    def test_update_from_mapping_adds_counts(self):
+        freq = Frequency({'a': 2})
+        freq.update({'a': 3, 'b': 1})
+        self.assertEqual(freq, {'a': 5, 'b': 1})
+        freq.update(b=2)
+        self.assertEqual(freq, {'a': 5, 'b': 3})
+        self.assertEqual(freq.total(), 8)
+
+    def test_update_counts_tuples_as_keys(self):
+        freq = Frequency()
+        freq.update([('a', 'b'), ('b', 'c'), ('a', 'b')])
+        self.assertEqual(freq[('a', 'b')], 2)
+        self.assertEqual(freq.total(), 3)
+
+    def test_failed_update_keeps_total(self):
+        def words():
+            yield 'a'
+            yield 'b'
+            raise RuntimeError()
+        freq = Frequency()
+        with self.assertRaises(RuntimeError):
+            freq.update(words())
+        self.assertEqual(freq.total(), sum(freq.values()))
+
+    def test_most_common(self):
+        freq = Frequency('abbcccdddd')
+        self.assertEqual(freq.most_common(2), [('d', 4), ('c', 3)])
+        self.assertEqual([key for key, _ in freq.most_common()], ['d', 'c', 'b', 'a'])
+        self.assertEqual(sorted(freq.elements()), list('abbcccdddd'))
+
+class FrequencyStatsTests(unittest.TestCase):
+
+    def test_stats(self):
+        freq = Frequency('abbccc')
+        self.assertEqual(freq.maximum(), ('c', 3))
+        self.assertEqual(freq.minimum(), ('a', 1))
+        self.assertEqual(freq.average(), 2)
+
+    def test_stats_invalidated_by_changes(self):
+        freq = Frequency('abbccc')
+        self.assertEqual(freq.maximum(), ('c', 3))
+
+        freq.update('dddd')
+        self.assertEqual(freq.maximum(), ('d', 4))
+        freq.increment('a')
+        freq.increment('a')
+        freq.increment('a')
+        freq.increment('a')
+        self.assertEqual(freq.maximum(), ('a', 5))
+        freq['e'] = 0
+        self.assertEqual(freq.minimum(), ('e', 0))
+        del freq['e']
+        self.assertEqual(freq.minimum(), ('b', 2))
+        freq.decrement('a')
+        freq.pop('d')
+        self.assertEqual(freq.maximum(), ('a', 4))
+        freq -= Frequency('aaa')
+        self.assertEqual(freq.minimum(), ('a', 1))
+        freq.clear()
+        with self.assertRaises(ValueError):
+            freq.maximum()
+
+if __name__ == "__main__":
+    unittest.main()
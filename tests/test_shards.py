@@ -0,0 +1,67 @@
+"""
+Tests for writing and merging partial count files.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ngramlight"))
+
+from counting import Frequency
+from shards import write_partial, merge, load
+
+class MergeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def write(self, name, frequency, N=2):
+        write_partial(frequency, N, self.path(name))
+        return self.path(name)
+
+    def test_merge_remaps_vocabularies(self):
+        # The partials share only some of their words, so the same word has
+        # a different ID in each partial and in the merged vocabulary.
+        first  = Frequency({('the', 'cat'): 2, ('cat', 'sat'): 1, ('zebra', 'the'): 1})
+        second = Frequency({('a', 'cat'): 3, ('the', 'cat'): 1, ('cat', 'ran'): 4})
+        third  = Frequency({('the', 'dog'): 5})
+
+        for output in ("merged", "merged.gz"):
+            paths = [self.write("first", first), self.write("second.gz", second), self.write("third", third)]
+            merge(paths, self.path(output))
+            merged = load(self.path(output))
+            self.assertEqual(merged, first + second + third)
+            self.assertEqual(merged.total(), 17)
+
+    def test_merge_unigrams(self):
+        paths = [self.write("a", Frequency("abc"), 1), self.write("b", Frequency("cde"), 1)]
+        merge(paths, self.path("merged"))
+        self.assertEqual(load(self.path("merged")), Frequency("abccde"))
+
+    def test_merge_different_N(self):
+        paths = [self.write("a", Frequency("ab"), 1), self.write("b", Frequency({('a', 'b'): 1}))]
+        with self.assertRaises(ValueError):
+            merge(paths, self.path("merged"))
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["a", "b"])
+
+    def test_failed_merge_removes_temporary_file(self):
+        good = self.write("good.gz", Frequency({('the', 'cat'): 2}))
+        with open(self.path("bad"), "wb") as bad:
+            bad.write("2\t2\nthe\ncat\n0 1\t3\nmalformed row\n")
+
+        for output in ("merged", "merged.gz"):
+            with self.assertRaises(ValueError):
+                merge([good, self.path("bad")], self.path(output))
+            self.assertEqual(sorted(os.listdir(self.tmpdir)), ["bad", "good.gz"])
+
+if __name__ == "__main__":
+    unittest.main()